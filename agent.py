@@ -1,11 +1,11 @@
 import json
 from os import path
-from openai import OpenAI
 from message import Message, ALLOWED_MESSAGE_TYPES
 from action import Action
+from router import ModelRouter
 
 class Agent:
-    def __init__(self, alias, name, agent_type, identity, available_actions, military_power, economic_power, goal, description, client, use_full_identity, known_entities):
+    def __init__(self, alias, name, agent_type, identity, available_actions, military_power, economic_power, goal, description, client, use_full_identity, known_entities, router=None, messages_config=None):
         self.alias = alias
         self.name = name
         self.type = agent_type
@@ -16,9 +16,10 @@ class Agent:
         self.goal = goal
         self.description = description
         self.client = client
+        self.router = router or ModelRouter(client)
         self.use_full_identity = use_full_identity
         self.known_entities = known_entities  # Dictionary mapping aliases to full names
-        self.messages_config = self.load_messages_config()
+        self.messages_config = messages_config if messages_config is not None else self.load_messages_config()
         self.system_prompt = self.generate_system_prompt()
 
         
@@ -87,16 +88,17 @@ class Agent:
             "action": "<Action>"
         }}
         """
-        response = await self.client.beta.chat.completions.parse(
-            model="gpt-4o-mini-2024-07-18",
+        action = await self.router.parse(
+            "agent.act",
             messages=[
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            response_format=Action
+            response_format=Action,
+            agent_type=self.type,
+            agent_alias=self.alias,
+            validate=self.validate_action
         )
-        action = response.choices[0].message.parsed
-        self.validate_action(action)
         return action
 
     def validate_action(self, action):
@@ -166,17 +168,17 @@ class Agent:
         }}
         """
         
-        response = await self.client.beta.chat.completions.parse(
-            model="gpt-4o-mini-2024-07-18",
+        message = await self.router.parse(
+            "agent.messages",
             messages=[
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            response_format=Message
+            response_format=Message,
+            agent_type=self.type,
+            agent_alias=self.alias,
+            validate=self.validate_message
         )
-        
-        message = response.choices[0].message.parsed
-        self.validate_message(message)
         return [message]
 
     def validate_message(self, message):
@@ -198,6 +200,13 @@ class Agent:
 
     
     
+    def retrieval_query(self, relations_matrix):
+        """Builds the memory query from the agent's goal and its current allies and enemies."""
+        # The diagonal of the relations matrix is 1, so the agent would otherwise list itself as an ally
+        allies = [alias for alias in relations_matrix.get_friends(self.alias) if alias != self.alias]
+        enemies = [alias for alias in relations_matrix.get_enemies(self.alias) if alias != self.alias]
+        return f"{self.alias} {self.goal} allies: {' '.join(allies)} enemies: {' '.join(enemies)}"
+
     def read_messages(self, mail):
         return mail.read(self.alias)
 
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 from relations_matrix import RelationsMatrix
 import os
 
@@ -7,55 +6,119 @@ def load_matrix_from_json(config_path):
     relations_matrix = RelationsMatrix(config_path)
     return relations_matrix.to_matrix(relations_matrix.relations.keys())
 
+def load_matrix(source):
+    """Accepts a relations JSON path or an already loaded {alias: {alias: value}} dict."""
+    if isinstance(source, dict):
+        relations_matrix = RelationsMatrix(relations=source)
+        return relations_matrix.to_matrix(relations_matrix.relations.keys())
+    return load_matrix_from_json(source)
+
+def _flatten_pair(matrix1, matrix2):
+    """
+    Broadcasts two (..., N, N) stacks against each other and flattens the last
+    two axes. Entries that are NaN in either input are zeroed and masked out.
+    """
+    matrix1, matrix2 = np.broadcast_arrays(np.asarray(matrix1, dtype=float), np.asarray(matrix2, dtype=float))
+    matrix1 = matrix1.reshape(matrix1.shape[:-2] + (-1,))
+    matrix2 = matrix2.reshape(matrix2.shape[:-2] + (-1,))
+    valid = ~(np.isnan(matrix1) | np.isnan(matrix2))
+    return np.where(valid, matrix1, 0.0), np.where(valid, matrix2, 0.0), valid
+
+def _safe_divide(numerator, denominator, default):
+    out = np.full(np.shape(numerator), default, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out[()]
+
+# All measures broadcast over leading axes: two N x N matrices give a scalar,
+# a (steps, runs, N, N) stack against an N x N matrix gives a (steps, runs) array.
+
 def measure_mse(matrix1, matrix2):
-    matrix1 = np.array(matrix1)
-    matrix2 = np.array(matrix2)
-    return np.mean((matrix1 - matrix2) ** 2)
+    matrix1, matrix2, valid = _flatten_pair(matrix1, matrix2)
+    return _safe_divide(np.sum((matrix1 - matrix2) ** 2, axis=-1), np.sum(valid, axis=-1), np.nan)
 
 def measure_cosine_similarity(matrix1, matrix2):
-    matrix1 = np.array(matrix1).flatten()
-    matrix2 = np.array(matrix2).flatten()
-    return np.dot(matrix1, matrix2) / (np.linalg.norm(matrix1) * np.linalg.norm(matrix2))
+    # A zero matrix has no direction, so its similarity to anything is 0
+    matrix1, matrix2, _ = _flatten_pair(matrix1, matrix2)
+    norms = np.linalg.norm(matrix1, axis=-1) * np.linalg.norm(matrix2, axis=-1)
+    return _safe_divide(np.sum(matrix1 * matrix2, axis=-1), norms, 0.0)
 
 def measure_jaccard_similarity(matrix1, matrix2):
-    matrix1 = np.array(matrix1).flatten()
-    matrix2 = np.array(matrix2).flatten()
-    intersection = np.sum(np.minimum(matrix1, matrix2))
-    union = np.sum(np.maximum(matrix1, matrix2))
-    return intersection / union
+    matrix1, matrix2, _ = _flatten_pair(matrix1, matrix2)
+    intersection = np.sum(np.minimum(matrix1, matrix2), axis=-1)
+    union = np.sum(np.maximum(matrix1, matrix2), axis=-1)
+    # Signed relations can cancel out, so a zero union does not imply empty matrices
+    # and the ratio is undefined there: identical matrices score 1, any others 0
+    identical = np.all(matrix1 == matrix2, axis=-1)
+    return np.where(union == 0, identical.astype(float), _safe_divide(intersection, union, 0.0))[()]
 
 def measure_pearson_correlation(matrix1, matrix2):
-    matrix1 = np.array(matrix1).flatten()
-    matrix2 = np.array(matrix2).flatten()
-    return np.corrcoef(matrix1, matrix2)[0, 1]
+    # Correlation with a constant matrix is undefined and reported as 0
+    matrix1, matrix2, valid = _flatten_pair(matrix1, matrix2)
+    count = np.sum(valid, axis=-1, keepdims=True)
+    centered1 = (matrix1 - _safe_divide(np.sum(matrix1, axis=-1, keepdims=True), count, 0.0)) * valid
+    centered2 = (matrix2 - _safe_divide(np.sum(matrix2, axis=-1, keepdims=True), count, 0.0)) * valid
+    denominator = np.sqrt(np.sum(centered1 ** 2, axis=-1) * np.sum(centered2 ** 2, axis=-1))
+    return _safe_divide(np.sum(centered1 * centered2, axis=-1), denominator, 0.0)
+
+def stack_relations(states, agent_aliases):
+    """Stacks the relations of recorded world states into a (steps, N, N) array."""
+    return np.array([
+        [[state["relations_matrix"][agent][other] for other in agent_aliases] for agent in agent_aliases]
+        for state in states
+    ], dtype=float)
 
 class Analytics:
     def __init__(self, start_path, end_path, measures, output_dir):
-        self.start_matrix = load_matrix_from_json(start_path)
-        self.end_matrix = load_matrix_from_json(end_path)
+        self.start_matrix = load_matrix(start_path)
+        self.end_matrix = load_matrix(end_path)
+        self.end_array = np.array(self.end_matrix, dtype=float)
         self.measures = measures
-        self.output_dir = output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
+        self.output_dir = output_dir  # None disables rendering
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
 
     def compare_current_to_end(self, current_matrix):
         results = {}
         for measure_name, measure_func in self.measures.items():
-            results[measure_name] = measure_func(current_matrix, self.end_matrix)
+            results[measure_name] = measure_func(current_matrix, self.end_array)
         return results
 
+    def compare_batch(self, matrices):
+        """
+        Scores a stack of matrices shaped (..., N, N), e.g. (steps, runs, N, N),
+        against the end matrix with every registered measure in one vectorized
+        call per measure. Returns {measure_name: array of the leading shape}.
+        """
+        matrices = np.asarray(matrices, dtype=float)
+        return {
+            measure_name: np.asarray(measure_func(matrices, self.end_array))
+            for measure_name, measure_func in self.measures.items()
+        }
+
     def visualize_matrices(self, current_matrix, step):
-        fig, axes = plt.subplots(1, 2, figsize=(12, 6))
-        
+        """
+        Renders the current and end matrices side by side. Uses matplotlib's
+        object-oriented API without pyplot's global state, so it is safe to
+        run in a worker thread.
+        """
+        if self.output_dir is None:
+            return
+        # matplotlib is slow to import, so it is only loaded once something is rendered
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(12, 6))
+        axes = fig.subplots(1, 2)
+
         self.plot_matrix(current_matrix, axes[0], "Current Matrix at Step {}".format(step))
         self.plot_matrix(self.end_matrix, axes[1], "End Matrix")
 
-        plt.tight_layout()
-        plt.savefig(os.path.join(self.output_dir, f"matrix_comparison_step_{step}.png"))
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(os.path.join(self.output_dir, f"matrix_comparison_step_{step}.png"))
 
     def plot_matrix(self, matrix, ax, title):
-        cmap = plt.cm.RdBu_r
-        norm = plt.Normalize(vmin=-1, vmax=1)
+        from matplotlib import colormaps
+        from matplotlib.colors import Normalize
+        cmap = colormaps["RdBu_r"]
+        norm = Normalize(vmin=-1, vmax=1)
         cax = ax.matshow(matrix, cmap=cmap, norm=norm)
         ax.set_title(title)
-        plt.colorbar(cax, ax=ax)
+        ax.figure.colorbar(cax, ax=ax)
@@ -0,0 +1,163 @@
+import numpy as np
+
+class CoalitionStructure:
+    """
+    Tracks the coalition structure of the relations matrix incrementally.
+
+    Register `on_update` as a listener on a RelationsMatrix and every call to
+    `update_relations` adjusts the alliance components, triangle counts, tie
+    counts and hostile ties between blocs without recomputing them from the
+    whole matrix. Only a broken alliance forces an O(N^2) component rebuild.
+    """
+    def __init__(self, agent_aliases, relations):
+        self.aliases = list(agent_aliases)
+        self.index = {alias: i for i, alias in enumerate(self.aliases)}
+        self.signs = np.sign(np.array(
+            [[relations[agent][other] for other in self.aliases] for agent in self.aliases],
+            dtype=float
+        ))
+        np.fill_diagonal(self.signs, 0)
+        self.rebuild()
+
+    def rebuild(self):
+        """Recomputes every tracked quantity from the current sign matrix."""
+        signs = self.signs
+        abs_signs = np.abs(signs)
+        upper = np.triu(np.ones_like(signs, dtype=bool), 1)
+
+        self.positive_ties = int(np.sum((signs > 0) & upper))
+        self.negative_ties = int(np.sum((signs < 0) & upper))
+
+        # trace(S^3) / 6 sums the sign products over all triangles
+        self.signed_triangles = np.einsum("ij,jk,ki->", signs, signs, signs) / 6
+        self.total_triangles = np.einsum("ij,jk,ki->", abs_signs, abs_signs, abs_signs) / 6
+
+        self.rebuild_components()
+
+    def rebuild_components(self):
+        # Label propagation over the alliance graph: every node takes the smallest
+        # label among itself and its allies until nothing changes. The smallest
+        # label in each component is the component's own index, so the labels
+        # double as a valid union-find parent array.
+        allied = self.signs > 0
+        np.fill_diagonal(allied, True)
+        labels = np.arange(len(self.aliases))
+        while True:
+            new_labels = np.where(allied, labels[None, :], len(labels)).min(axis=1)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+        self.parent = labels
+        self.between_negative_ties = self.count_between_negative_ties(labels)
+
+    def count_between_negative_ties(self, labels):
+        hostile = (self.signs < 0) & (labels[:, None] != labels[None, :])
+        return int(np.sum(np.triu(hostile, 1)))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    def on_update(self, agent1, agent2, old_val, new_val):
+        i, j = self.index[agent1], self.index[agent2]
+        old_sign, new_sign = np.sign(old_val), np.sign(new_val)
+        if i == j or old_sign == new_sign:
+            return
+
+        # Every triangle through (i, j) closes via some third agent k
+        self.signed_triangles += (new_sign - old_sign) * np.dot(self.signs[i], self.signs[j])
+        self.total_triangles += (abs(new_sign) - abs(old_sign)) * np.dot(np.abs(self.signs[i]), np.abs(self.signs[j]))
+        self.positive_ties += int(new_sign > 0) - int(old_sign > 0)
+        self.negative_ties += int(new_sign < 0) - int(old_sign < 0)
+
+        self.signs[i, j] = self.signs[j, i] = new_sign
+
+        if old_sign > 0:
+            # Union-find cannot split a set, so a broken alliance forces a rebuild
+            self.rebuild_components()
+            return
+
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i == root_j:
+            return
+        if old_sign < 0:
+            self.between_negative_ties -= 1
+        if new_sign < 0:
+            self.between_negative_ties += 1
+        elif new_sign > 0:
+            # Hostile ties between the two merging components become internal
+            labels = self.component_labels()
+            hostile = self.signs[np.ix_(labels == root_i, labels == root_j)] < 0
+            self.between_negative_ties -= int(np.sum(hostile))
+            self.union(i, j)
+
+    def component_labels(self):
+        return np.array([self.find(i) for i in range(len(self.aliases))])
+
+    def components(self):
+        """Returns the alliance components as lists of aliases."""
+        labels = self.component_labels()
+        return [[self.aliases[i] for i in np.flatnonzero(labels == root)] for root in np.unique(labels)]
+
+    def enemy_blocs(self):
+        """
+        Returns pairs of alliance components whose average relation is hostile.
+        """
+        labels = self.component_labels()
+        roots, membership = np.unique(labels, return_inverse=True)
+        indicator = np.zeros((len(labels), len(roots)))
+        indicator[np.arange(len(labels)), membership] = 1
+        sizes = indicator.sum(axis=0)
+        mean_relation = (indicator.T @ self.signs @ indicator) / np.outer(sizes, sizes)
+        components = self.components()
+        return [
+            (components[a], components[b])
+            for a, b in zip(*np.nonzero(np.triu(mean_relation < 0, 1)))
+        ]
+
+    def balance(self):
+        """
+        Returns balanced and unbalanced triangle counts and the balance ratio.
+        A triangle is balanced when the product of its three signs is positive.
+        """
+        balanced = (self.total_triangles + self.signed_triangles) / 2
+        unbalanced = (self.total_triangles - self.signed_triangles) / 2
+        ratio = balanced / self.total_triangles if self.total_triangles else 1.0
+        return {"balanced": int(round(balanced)), "unbalanced": int(round(unbalanced)), "ratio": float(ratio)}
+
+    def polarization(self):
+        """
+        Polarization index in [0, 1]: the share of the largest possible two-camp
+        cut (floor(N^2 / 4) pairs) made of hostile ties between alliance components,
+        weighted by the balance ratio. Two internally allied camps hostile to each
+        other score 1. A grand alliance has no hostile ties and all-against-all has
+        only unbalanced triangles, so both score 0.
+
+        Balance is undefined without triangles, so small or sparse graphs are scored
+        on the cut share alone: a single hostile pair among three otherwise neutral
+        agents scores 0.5.
+        """
+        max_cut = len(self.aliases) ** 2 // 4
+        if max_cut == 0:
+            return 0.0
+        cut_share = min(1.0, self.between_negative_ties / max_cut)
+        if self.total_triangles == 0:
+            return cut_share
+        return cut_share * self.balance()["ratio"]
+
+    def snapshot(self):
+        return {
+            "components": self.components(),
+            "enemy_blocs": self.enemy_blocs(),
+            "positive_ties": self.positive_ties,
+            "negative_ties": self.negative_ties,
+            "balance": self.balance(),
+            "polarization": self.polarization(),
+        }
@@ -1,19 +1,107 @@
 # custom_logger.py
+import atexit
+import contextvars
+import json
 import logging
+import math
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 # Set up the logger
 logger = logging.getLogger(__name__)
 
-def setup_logger(log_level=logging.INFO, log_file=None):
+# Structured events go to their own logger so they never reach the human-readable handlers
+event_logger = logging.getLogger(__name__ + ".events")
+event_logger.propagate = False
+
+_listener = None
+
+# World the current asyncio task is simulating; each task keeps its own value
+current_world = contextvars.ContextVar("current_world", default=None)
+
+def set_world(world_id):
+    """Tags every record logged from the current task (and tasks it spawns) with world_id."""
+    current_world.set(world_id)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that hands the record over untouched. The default prepare()
+    formats the message in the calling thread; deferring it moves all string
+    formatting onto the listener thread. Callers must pass args that are not
+    mutated afterwards (snapshots, not live objects).
+    """
+    def prepare(self, record):
+        return record
+
+    def emit(self, record):
+        # Runs in the logging task, where the world id context variable is visible
+        record.world_id = current_world.get()
+        super().emit(record)
+
+
+class WorldFormatter(logging.Formatter):
+    """Prefixes records from a hosted world with its id."""
+    def format(self, record):
+        text = super().format(record)
+        world_id = getattr(record, "world_id", None)
+        return f" [{world_id}]{text}" if world_id is not None else text
+
+
+def to_json_safe(value):
+    """Replaces NaN and infinities, which JSON cannot represent, with None."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: to_json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(item) for item in value]
+    return value
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        event = {"time": record.created, "event": record.event}
+        if getattr(record, "world_id", None) is not None:
+            event["world_id"] = record.world_id
+        event.update(record.payload)
+        return json.dumps(to_json_safe(event), default=str, allow_nan=False)
+
+
+class RelationsTable:
+    """Snapshot of the relations matrix that is only rendered as text when the record is emitted."""
+    def __init__(self, relations, agent_aliases):
+        self.agent_aliases = agent_aliases
+        self.headers, self.table = to_user_friendly_format(relations, agent_aliases)
+
+    def __str__(self):
+        # Determine column width for better alignment
+        column_width = max(len(alias) for alias in self.agent_aliases) + 2  # Adding padding for readability
+
+        # Format headers and each row in the table
+        lines = ["".join(f"{header:>{column_width}}" for header in self.headers)]
+        for row in self.table:
+            lines.append("".join(f"{str(item):>{column_width}}" for item in row))
+        return "\n ".join(lines)
+
+
+def setup_logger(log_level=logging.INFO, log_file=None, events_file=None):
     """
     Set up the logger with a specified level and optionally a log file.
-    
+    Records are queued and written by a background thread.
+
     Args:
     - log_level (int): The logging level (e.g., logging.DEBUG, logging.INFO).
     - log_file (str): The path to a log file. If None, logs will be printed to the console.
+    - events_file (str): The path to a JSONL event stream. If None, no events are written.
     """
+    global _listener
+    shutdown_logger()
+
     # Define the log format
-    formatter = logging.Formatter(' %(message)s')
+    formatter = WorldFormatter(' %(message)s')
+    is_event = lambda record: hasattr(record, "event")
+    handlers = []
 
     # Create handlers
     if log_file:
@@ -21,61 +109,110 @@ def setup_logger(log_level=logging.INFO, log_file=None):
         file_handler = logging.FileHandler(log_file, mode='w')  # Overwrite mode
         file_handler.setLevel(log_level)
         file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-    
+        file_handler.addFilter(lambda record: not is_event(record))
+        handlers.append(file_handler)
+
     console_handler = logging.StreamHandler()
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.addFilter(lambda record: not is_event(record))
+    handlers.append(console_handler)
+
+    if events_file:
+        events_handler = logging.FileHandler(events_file, mode='w')
+        events_handler.setFormatter(JsonLinesFormatter())
+        events_handler.addFilter(is_event)
+        handlers.append(events_handler)
 
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    logger.handlers = [queue_handler]
     logger.setLevel(log_level)
+    event_logger.handlers = [queue_handler] if events_file else []
+    event_logger.setLevel(logging.INFO if events_file else logging.CRITICAL + 1)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logger():
+    """Flushes queued records and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(shutdown_logger)
+
+def log_event(event, **payload):
+    """Emits one line on the JSONL event stream. Payload values must be JSON-friendly snapshots."""
+    if event_logger.isEnabledFor(logging.INFO):
+        event_logger.info(event, extra={"event": event, "payload": payload})
 
 def log_agents_intro(agents):
     logger.info("Introduction of agents:")
     for agent in agents:
-        logger.info(f"Alias: {agent.alias}, Name: {agent.name}, Identity: {agent.identity}")
+        logger.info("Alias: %s, Name: %s, Identity: %s", agent.alias, agent.name, agent.identity)
 
 def log_relations(relations, agents):
-    logger.info("Relations Matrix:")
-    agent_aliases = [agent.alias for agent in agents]
-    headers, table = to_user_friendly_format(relations, agent_aliases)
-
-    # Determine column width for better alignment
-    column_width = max(len(alias) for alias in agent_aliases) + 2  # Adding padding for readability
-
-    # Format headers
-    header_line = "".join(f"{header:>{column_width}}" for header in headers)
-    logger.info(header_line)
-
-    # Format each row in the table
-    for row in table:
-        row_line = "".join(f"{str(item):>{column_width}}" for item in row)
-        logger.info(row_line)
+    # Rendering the table is the most expensive record, so it is only built at DEBUG level
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    logger.debug("Relations Matrix:")
+    logger.debug("%s", RelationsTable(relations, [agent.alias for agent in agents]))
 
 def to_user_friendly_format(relations, agent_aliases):
     headers = [""] + agent_aliases
     table = [[agent] + [relations[agent][other] for other in agent_aliases] for agent in agent_aliases]
     return headers, table
 
-def log_agent_state(agents):
+def log_agent_state(agents, step=None):
     logger.info("Agents' State Variables:")
     for agent in agents:
         # Format the military and economic power to one decimal place
-        logger.info(f"{agent.alias} - Military Power: {agent.military_power:.1f}, Economic Power: {agent.economic_power:.1f}")
+        logger.info("%s - Military Power: %.1f, Economic Power: %.1f", agent.alias, agent.military_power, agent.economic_power)
+    log_event("state", step=step, agents={
+        agent.alias: {"military_power": agent.military_power, "economic_power": agent.economic_power}
+        for agent in agents
+    })
 
-def log_messages(messages):
+def log_messages(messages, step=None):
     logger.info("Messages Sent:")
     for message in messages:
-        # Truncate content to 50 characters and add ellipsis if needed
+        # Truncate content to 100 characters and add ellipsis if needed
         truncated_content = (message.content[:97] + '...') if len(message.content) > 100 else message.content
-        logger.info(f"Type: {message.message_type}, From: {message.sender}, To: {message.recipient}, Content: {truncated_content}")
+        logger.info("Type: %s, From: %s, To: %s, Content: %s", message.message_type, message.sender, message.recipient, truncated_content)
+        log_event("message", step=step, **message.to_dict())
 
-def log_actions(actions):
+def log_actions(actions, step=None):
     logger.info("Actions Taken:")
     for action in actions:
-        logger.info(f"Agent: {action.subject}, Action: {action.action}, Object: {action.object}")
+        logger.info("Agent: %s, Action: %s, Object: %s", action.subject, action.action, action.object)
+        log_event("action", step=step, **action.model_dump())
+
+def log_updates(updates, step=None):
+    for update in updates:
+        log_event("update", step=step, **update.model_dump())
 
-def log_analytics(analytics_results, analytics, current_matrix, step):
+def log_analytics(analytics_results, step):
     for measure_name, value in analytics_results.items():
-        logger.info(f"{measure_name}: {value:.2f}")
-    analytics.visualize_matrices(current_matrix, step)
+        logger.info("%s: %.2f", measure_name, value)
+    log_event("analytics", step=step, **{name: float(value) for name, value in analytics_results.items()})
+
+def log_model_usage(router):
+    logger.info("Model Usage:")
+    for model, usage in router.usage_summary().items():
+        logger.info("%s - Calls: %d, Invalid: %d, Latency: %.1fs, Cost: $%.4f", model, usage['calls'], usage['invalid'], usage['latency'], usage['cost'])
+
+def log_coalition_structure(snapshot, step=None):
+    logger.info("Coalition Structure:")
+    for component in snapshot["components"]:
+        logger.info("Alliance: %s", ', '.join(component))
+    for bloc_a, bloc_b in snapshot["enemy_blocs"]:
+        logger.info("Enemy Blocs: [%s] vs [%s]", ', '.join(bloc_a), ', '.join(bloc_b))
+    balance = snapshot["balance"]
+    logger.info("Ties - Positive: %d, Negative: %d", snapshot['positive_ties'], snapshot['negative_ties'])
+    logger.info("Triangles - Balanced: %d, Unbalanced: %d, Balance Ratio: %.2f", balance['balanced'], balance['unbalanced'], balance['ratio'])
+    logger.info("Polarization Index: %.2f", snapshot['polarization'])
+    log_event("structure", step=step, **snapshot)
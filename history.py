@@ -0,0 +1,85 @@
+import copy
+from collections import deque
+
+class WorldHistory:
+    """
+    Ring buffer of world states that only keeps one full snapshot.
+
+    The newest state is stored in full; every older state is stored as an undo
+    delta holding just the relations and powers that differ from the state after
+    it. Older states are rebuilt on demand by applying undo deltas backwards from
+    the newest one, and the deque drops the oldest entry once `depth` is reached.
+    Rebuilding costs one delta application per step back plus a deep copy per
+    returned state, so callers should ask only for the states they need.
+    """
+    def __init__(self, depth=100):
+        if depth < 1:
+            raise ValueError(f"History depth must be at least 1, got {depth}.")
+        self.depth = depth
+        self.entries = deque(maxlen=depth)
+        self.head = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, state):
+        snapshot = {
+            "military_strength": dict(state["military_strength"]),
+            "economic_strength": dict(state["economic_strength"]),
+            "relations_matrix": copy.deepcopy(state["relations_matrix"]),
+        }
+        if self.head is not None:
+            self.entries[-1]["undo"] = self.diff(snapshot, self.head)
+        self.entries.append({"actions": copy.deepcopy(state["actions"]), "undo": None})
+        self.head = snapshot
+
+    def add_action(self, agent_alias, action):
+        """Adds an action (as a dict) to the newest state. Ignored if nothing is recorded yet."""
+        if self.entries:
+            self.entries[-1]["actions"][agent_alias].append(action)
+
+    @staticmethod
+    def diff(new, old):
+        """Returns the values of `old` that differ from `new`."""
+        delta = {
+            "military_strength": {k: v for k, v in old["military_strength"].items() if new["military_strength"].get(k) != v},
+            "economic_strength": {k: v for k, v in old["economic_strength"].items() if new["economic_strength"].get(k) != v},
+            "relations_matrix": {},
+        }
+        for agent, row in old["relations_matrix"].items():
+            new_row = new["relations_matrix"].get(agent, {})
+            changed = {other: val for other, val in row.items() if new_row.get(other) != val}
+            if changed:
+                delta["relations_matrix"][agent] = changed
+        return delta
+
+    @staticmethod
+    def apply(snapshot, delta):
+        snapshot["military_strength"].update(delta["military_strength"])
+        snapshot["economic_strength"].update(delta["economic_strength"])
+        for agent, changed in delta["relations_matrix"].items():
+            snapshot["relations_matrix"][agent].update(changed)
+
+    def states(self, last=None):
+        """
+        Returns the recorded states oldest first, each as an independent dict in
+        the same shape as World.get_current_state(). `last` limits the result
+        to the most recent states, which also limits how far back it replays.
+        """
+        if not self.entries:
+            return []
+        count = len(self.entries) if last is None else min(last, len(self.entries))
+        current = copy.deepcopy(self.head)
+        states = []
+        for offset in range(1, count + 1):
+            entry = self.entries[-offset]
+            if offset > 1:
+                self.apply(current, entry["undo"])
+            states.append({
+                "actions": copy.deepcopy(entry["actions"]),
+                "military_strength": dict(current["military_strength"]),
+                "economic_strength": dict(current["economic_strength"]),
+                "relations_matrix": copy.deepcopy(current["relations_matrix"]),
+            })
+        states.reverse()
+        return states
@@ -1,32 +1,52 @@
+import argparse
 import asyncio
 import logging
 import os
-from os import path
 import json
-from dotenv import load_dotenv
-from openai import AsyncOpenAI
 from agent import Agent
 from mail import Mail
 from world import World
 from relations_matrix import RelationsMatrix
+from router import ModelRouter
+from coalition_structure import CoalitionStructure
+from memory import MemoryStore
+from scenario import DEFAULT_SCENARIO, load_scenario, save_bundle
 from analytics import Analytics, measure_mse, measure_cosine_similarity, measure_jaccard_similarity, measure_pearson_correlation
 import custom_logger as logger_module
 
-async def simulation_loop(agents, world, rounds, analytics):
+async def simulation_loop(agents, world, rounds, analytics, structure, memory, memory_top_k, on_round_end=None, world_id=None):
+    if world_id is not None:
+        logger_module.set_world(world_id)
     logger_module.log_agents_intro(agents)
     logger_module.log_relations(world.relations_matrix.relations, agents)
 
     for step in range(rounds):
+        # Reset the router's per-round latency and cost budgets
+        world.router.start_round()
+
         # Record the state of the world
         world.record_state()
 
-        # Step 1: Agents read existing public statements and private messages
+        # Step 1: Agents recall the messages, public statements and actions most relevant
+        # to their goal, allies and enemies, scored for all agents in one batch
         public_statements = world.mail.read_public_statements()
+        recalled = memory.query_all(
+            {agent.alias: agent.retrieval_query(world.relations_matrix) for agent in agents},
+            memory_top_k
+        )
+        personal_memories = {
+            alias: json.dumps([item for item in items if item["kind"] == "message"])
+            for alias, items in recalled.items()
+        }
+        public_memories = {
+            alias: json.dumps([item for item in items if item["kind"] != "message"])
+            for alias, items in recalled.items()
+        }
         message_tasks = [
             agent.decide_and_send_messages(
                 json.dumps(world.get_current_state()),
-                json.dumps([message.to_dict() for message in agent.read_messages(world.mail)]),  # Properly serialized messages
-                json.dumps([statement.to_dict() for statement in public_statements]),  # Properly serialized public statements
+                personal_memories[agent.alias],
+                public_memories[agent.alias],
                 world.relations_matrix.relations  # Pass the relations matrix here
             ) for agent in agents
         ]
@@ -35,14 +55,14 @@ async def simulation_loop(agents, world, rounds, analytics):
         for agent, messages in zip(agents, messages_list):
             for message in messages:
                 world.mail.send(message)
-        logger_module.log_messages([msg for messages in messages_list for msg in messages])
+        logger_module.log_messages([msg for messages in messages_list for msg in messages], step)
 
         # Step 2: Agents take actions based on the state of the world, private messages, and public statements
         action_tasks = [
             agent.act(  # Ensure act() is awaited
                 json.dumps(world.get_current_state()),
-                json.dumps([message.to_dict() for message in agent.read_messages(world.mail)]),
-                json.dumps([statement.to_dict() for statement in public_statements])
+                personal_memories[agent.alias],
+                public_memories[agent.alias]
             ) for agent in agents
         ]
          
@@ -50,10 +70,15 @@ async def simulation_loop(agents, world, rounds, analytics):
         latest_actions = await asyncio.gather(*action_tasks)
         for agent, action in zip(agents, latest_actions):
             world.add_action(agent.alias, action)
-        logger_module.log_actions(latest_actions)
+        logger_module.log_actions(latest_actions, step)
 
           # Step 3: Finalize messages and public statements
         world.mail.finalize()
+        for messages in messages_list:
+            for message in messages:
+                memory.add_message(message, step)
+        for action in latest_actions:
+            memory.add_action(action, step)
 
 
         # Step 4: Process messages and public statements
@@ -65,50 +90,61 @@ async def simulation_loop(agents, world, rounds, analytics):
         # Step 5: Update world state based on interactions
         updates = await world.decide(latest_actions)
         world.apply_updates(updates)
-        logger_module.log_agent_state(agents)
+        logger_module.log_updates(updates, step)
+        logger_module.log_agent_state(agents, step)
 
         # Step 6: Compute and log similarity to end state
         current_matrix = world.relations_matrix.to_matrix(world.relations_matrix.relations.keys())
         logger_module.log_relations(world.relations_matrix.relations, agents)
         analytics_results = analytics.compare_current_to_end(current_matrix)
        
-        logger_module.log_analytics(analytics_results, analytics, current_matrix, step)
+        logger_module.log_analytics(analytics_results, step)
+        # Rendering is slow, so it runs in a worker thread instead of blocking the event loop
+        await asyncio.to_thread(analytics.visualize_matrices, current_matrix, step)
+        logger_module.log_coalition_structure(structure.snapshot(), step)
+        logger_module.log_model_usage(world.router)
+
+        if on_round_end:
+            on_round_end(step)
+
+def create_simulation(client, router=None, output_dir="output", scenario=None):
+    """
+    Builds a world and its analytics, coalition structure and memory from a scenario
+    bundle (see scenario.py), compiling the default config directory if none is given.
+    Returns the keyword arguments for simulation_loop except `rounds`.
+    """
+    # Load configuration
+    scenario = scenario or load_scenario()
 
-if __name__ == "__main__":
-    # Initialize OpenAI client
-    load_dotenv()
-    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # Initialize model router shared by agents and the world
+    router = router or ModelRouter(client, config=scenario["models"])
 
     # Initialize mail system
     mail = Mail()
 
-    # Load configuration
-    script_dir = path.dirname(path.abspath(__file__))
-    agents_file_path = path.join(script_dir, "config/agents.json")
-    simulation_file_path = path.join(script_dir, "config/simulation.json")
-
-    with open(agents_file_path) as f:
-        agent_configs = json.load(f)
-
-    with open(simulation_file_path) as f:
-        simulation_config = json.load(f)
+    agent_configs = scenario["agents"]
+    simulation_config = scenario["simulation"]
     use_full_identity = simulation_config.get("use_full_identity", False)
 
     # Load relations matrix
-    relations_file_path = path.join(script_dir, "config/relations_start.json")
-    relations_matrix = RelationsMatrix(relations_file_path)
+    relations_matrix = RelationsMatrix(relations=scenario["relations_start"])
 
-    # Initialize custom logger
-    logger_module.setup_logger(log_level=logging.DEBUG, log_file='simulation.log')
+    # Track alliance components, blocs, balance and polarization as relations change
+    structure = CoalitionStructure(relations_matrix.relations.keys(), relations_matrix.relations)
+    relations_matrix.add_listener(structure.on_update)
+
+    # Initialize retrieval memory shared by all agents
+    memory = MemoryStore()
+    memory_top_k = simulation_config.get("memory_top_k", 10)
 
     # Initialize analytics with desired measures
     measures = {
         "MSE": measure_mse,
-        "Cosine Similarity": measure_cosine_similarity 
-        
+        "Cosine Similarity": measure_cosine_similarity,
+        "Jaccard Similarity": measure_jaccard_similarity,
+        "Pearson Correlation": measure_pearson_correlation
     }
-    relations_end_file_path = path.join(script_dir, "config/relations_end.json")
-    analytics = Analytics(relations_file_path, relations_end_file_path, measures, output_dir="output")
+    analytics = Analytics(scenario["relations_start"], scenario["relations_end"], measures, output_dir=output_dir)
 
     # Create a dictionary mapping aliases to details (name and identity) for known entities
     known_entities = {agent["alias"]: {"name": agent["name"], "identity": agent["identity"]} for agent in agent_configs}
@@ -128,14 +164,80 @@ if __name__ == "__main__":
                 description=a["description"],
                 client=client,
                 use_full_identity=use_full_identity,
-                known_entities=known_entities
+                known_entities=known_entities,
+                router=router,
+                messages_config=scenario["messages"]
             ) for a in agent_configs
         ],
         relations_matrix=relations_matrix,
         mail=mail,
         logger=logger_module,
-        client=client
+        client=client,
+        router=router,
+        history_depth=simulation_config.get("history_depth", 100),
+        decision_history=simulation_config.get("decision_history", 3),
+        action_effects=scenario["action_effects"]
     )
 
+    return {
+        "agents": list(world.agents.values()),
+        "world": world,
+        "analytics": analytics,
+        "structure": structure,
+        "memory": memory,
+        "memory_top_k": memory_top_k,
+    }
+
+def create_client():
+    # The OpenAI SDK is slow to import, so it is only loaded for online runs
+    from dotenv import load_dotenv
+    from openai import AsyncOpenAI
+    load_dotenv()
+    return AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the coalitions simulation.")
+    parser.add_argument("--rounds", type=int, default=5, help="Number of rounds to simulate (default: 5).")
+    parser.add_argument("--scenario", default=DEFAULT_SCENARIO,
+                        help="Scenario config directory or compiled bundle file (default: config/).")
+    parser.add_argument("--backend", choices=["openai", "offline"], default="openai",
+                        help="'openai' calls the API; 'offline' uses a seeded random policy with no network access.")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for the offline backend.")
+    parser.add_argument("--output-dir", default="output", help="Directory for matrix plots (default: output).")
+    parser.add_argument("--no-plots", action="store_true", help="Skip rendering matrix plots.")
+    parser.add_argument("--log-level", default="DEBUG", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Log level; the relations table is only rendered at DEBUG (default: DEBUG).")
+    parser.add_argument("--log-file", default="simulation.log", help="Human-readable log file (default: simulation.log).")
+    parser.add_argument("--events-file", default="events.jsonl", help="JSONL event stream (default: events.jsonl).")
+    parser.add_argument("--compile-scenario", metavar="BUNDLE",
+                        help="Compile --scenario into a single validated bundle file and exit.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenario = load_scenario(args.scenario)
+
+    if args.compile_scenario:
+        save_bundle(scenario, args.compile_scenario)
+        print(f"Compiled scenario bundle written to {args.compile_scenario}")
+        return
+
+    # Initialize the model backend
+    if args.backend == "offline":
+        from offline import OfflineBackend
+        client = None
+        router = ModelRouter(client, gateway=OfflineBackend(scenario, seed=args.seed), config=scenario["models"])
+    else:
+        client = create_client()
+        router = ModelRouter(client, config=scenario["models"])
+
+    # Initialize custom logger
+    logger_module.setup_logger(log_level=getattr(logging, args.log_level), log_file=args.log_file, events_file=args.events_file)
+
     # Run simulation
-    asyncio.run(simulation_loop(list(world.agents.values()), world, 5, analytics))
+    simulation = create_simulation(client, router=router, output_dir=None if args.no_plots else args.output_dir, scenario=scenario)
+    asyncio.run(simulation_loop(rounds=args.rounds, **simulation))
+    logger_module.shutdown_logger()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import re
+import zlib
+import numpy as np
+
+PUBLIC = "PUBLIC"
+
+def hash_embed(texts, dim=512):
+    """
+    Embeds texts with the hashing trick: every lower-cased word and word bigram
+    is hashed into one of `dim` buckets with a +/-1 sign, and rows are L2-normalized.
+    Runs offline and gives the same vectors across runs.
+    """
+    vectors = np.zeros((len(texts), dim))
+    for row, text in enumerate(texts):
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if not features:
+            continue
+        hashes = np.array([zlib.crc32(feature.encode()) for feature in features], dtype=np.uint64)
+        signs = np.where(hashes & (1 << 31), -1.0, 1.0)
+        np.add.at(vectors[row], (hashes % dim).astype(np.intp), signs)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class MemoryStore:
+    """
+    Shared retrieval memory for all agents.
+
+    Items (messages, public statements, actions) are embedded into one NumPy
+    matrix. Each row belongs to an agent alias or to PUBLIC, which every agent
+    can see. `query_all` scores every agent's query against every row with a
+    single matrix multiply and returns each agent's top-k visible items.
+    """
+    def __init__(self, dim=512, capacity=1024):
+        self.dim = dim
+        self.vectors = np.zeros((capacity, dim))
+        self.owners = []
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, owner, text, item):
+        self.add_many([owner], [text], [item])
+
+    def add_many(self, owners, texts, items):
+        if not items:
+            return
+        size = len(self.items)
+        if size + len(items) > len(self.vectors):
+            grown = np.zeros((max(2 * len(self.vectors), size + len(items)), self.dim))
+            grown[:size] = self.vectors[:size]
+            self.vectors = grown
+        self.vectors[size:size + len(items)] = hash_embed(texts, self.dim)
+        self.owners.extend(owners)
+        self.items.extend(items)
+
+    def add_message(self, message, step):
+        owner = PUBLIC if message.recipient == PUBLIC else message.recipient
+        text = f"{message.sender} {message.recipient} {message.message_type} {message.content}"
+        kind = "public" if owner == PUBLIC else "message"
+        self.add(owner, text, {"kind": kind, "step": step, **message.to_dict()})
+
+    def add_action(self, action, step):
+        text = f"{action.subject} {action.action} {action.object}"
+        self.add(PUBLIC, text, {"kind": "action", "step": step, **action.model_dump()})
+
+    def query(self, owner, text, k):
+        return self.query_all({owner: text}, k)[owner]
+
+    def query_all(self, queries, k):
+        """
+        Returns {owner: [items]} with each owner's k most similar visible items,
+        in the order they were stored.
+        """
+        results = {owner: [] for owner in queries}
+        size = len(self.items)
+        if size == 0 or k <= 0:
+            return results
+
+        owners = list(queries)
+        scores = hash_embed([queries[owner] for owner in owners], self.dim) @ self.vectors[:size].T
+        stored_owners = np.array(self.owners)
+        visible = (stored_owners[None, :] == np.array(owners)[:, None]) | (stored_owners == PUBLIC)[None, :]
+        scores = np.where(visible, scores, -np.inf)
+
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, owner in enumerate(owners):
+            indices = [i for i in np.sort(top[row]) if visible[row, i]]
+            results[owner] = [self.items[i] for i in indices]
+        return results
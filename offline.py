@@ -0,0 +1,58 @@
+import random
+import types
+from action import Action
+from message import Message, ALLOWED_MESSAGE_TYPES
+from update import UpdateItem, UpdateList
+
+class OfflineBackend:
+    """
+    Seeded random policy that stands in for the OpenAI API, for short runs and tests
+    without network access. It plugs into ModelRouter as its gateway and returns
+    responses that pass the agents' validation, on behalf of the agent whose alias
+    the router passes along with the call.
+    """
+    def __init__(self, scenario, seed=None):
+        self.agents = {agent["alias"]: agent for agent in scenario["agents"]}
+        self.aliases = list(self.agents)
+        self.random = random.Random(seed)
+
+    def acting_alias(self, agent_alias):
+        if agent_alias in self.agents:
+            return agent_alias
+        raise ValueError(f"Offline backend needs a known acting agent, got '{agent_alias}'.")
+
+    def respond(self, response_format, agent_alias=None):
+        if response_format is Action:
+            alias = self.acting_alias(agent_alias)
+            return Action(
+                subject=alias,
+                object=self.random.choice([other for other in self.aliases if other != alias] or self.aliases),
+                action=self.random.choice(self.agents[alias]["available_actions"])
+            )
+        if response_format is Message:
+            alias = self.acting_alias(agent_alias)
+            recipient = self.random.choice([other for other in self.aliases if other != alias] + ["PUBLIC"])
+            message_types = [t for t in ALLOWED_MESSAGE_TYPES.__args__ if t != "Public statement"]
+            return Message(
+                sender=alias,
+                recipient=recipient,
+                content="Offline message.",
+                message_type="Public statement" if recipient == "PUBLIC" else self.random.choice(message_types)
+            )
+        if response_format is UpdateList:
+            return UpdateList(updates=[
+                UpdateItem(
+                    agent_name=alias,
+                    military_change_percentage=self.random.uniform(-10, 10),
+                    economic_change_percentage=self.random.uniform(-10, 10)
+                ) for alias in self.aliases
+            ])
+        raise ValueError(f"Offline backend cannot produce {response_format.__name__}.")
+
+    async def parse(self, world_id, model, messages, response_format, agent_alias=None):
+        parsed = self.respond(response_format, agent_alias)
+        message = types.SimpleNamespace(parsed=parsed)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+    def forget(self, model, messages, response_format):
+        pass
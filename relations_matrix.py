@@ -1,8 +1,13 @@
 import json
 
 class RelationsMatrix:
-    def __init__(self, config_path):
-        self.relations = self.load_relations(config_path)
+    def __init__(self, config_path=None, relations=None):
+        # Relations may come preloaded from a scenario bundle; copy them so the bundle stays intact
+        if relations is not None:
+            self.relations = {alias: dict(row) for alias, row in relations.items()}
+        else:
+            self.relations = self.load_relations(config_path)
+        self.listeners = []
 
     def load_relations(self, config_path):
         with open(config_path) as f:
@@ -10,10 +15,16 @@ class RelationsMatrix:
             relations_matrix = {alias: data["relations"] for alias, data in relations_data.items()}
             return relations_matrix
 
+    def add_listener(self, listener):
+        """Registers a callback invoked as listener(agent1, agent2, old_val, new_val) on every update."""
+        self.listeners.append(listener)
+
     def update_relations(self, agent1, agent2, val):        
+        old_val = self.relations[agent1][agent2]
         self.relations[agent1][agent2] = val
         self.relations[agent2][agent1] = val
-        
+        for listener in self.listeners:
+            listener(agent1, agent2, old_val, val)
 
     def get_friends(self, agent_name):
         return [alias for alias, relation in self.relations[agent_name].items() if relation > 0]
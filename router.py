@@ -0,0 +1,141 @@
+import json
+import time
+from os import path
+
+class ModelRouter:
+    """
+    Routes every LLM call through a per call site (and optionally per agent type)
+    list of model tiers, ordered from cheapest/fastest to strongest.
+
+    - When the current round exceeds its latency or cost budget, calls drop one tier.
+    - When the parsed response fails validation, the call is retried one tier up.
+    - Every served call is recorded so the model behind each decision is known.
+    """
+    def __init__(self, client, config_path=None, gateway=None, world_id=None, config=None):
+        self.client = client
+        self.gateway = gateway  # Shared cache and rate limiter when hosted by a WorldServer
+        self.world_id = world_id
+        # The config may come preloaded from a scenario bundle instead of models.json
+        self.config = config if config is not None else self.load_config(config_path)
+        self.records = []
+        self.round_started = time.monotonic()
+        self.round_cost = 0.0
+
+    def load_config(self, config_path):
+        if config_path is None:
+            script_dir = path.dirname(path.abspath(__file__))
+            config_path = path.join(script_dir, "config/models.json")
+        with open(config_path) as f:
+            return json.load(f)
+
+    def start_round(self):
+        self.round_started = time.monotonic()
+        self.round_cost = 0.0
+
+    def site_config(self, call_site, agent_type=None):
+        site = {
+            "latency_budget": self.config.get("round_latency_budget"),
+            "cost_budget": self.config.get("round_cost_budget"),
+        }
+        site.update(self.config["call_sites"][call_site])
+        # Agent type overrides take precedence over the call site defaults
+        site.update(self.config.get("agent_types", {}).get(agent_type, {}).get(call_site, {}))
+        return site
+
+    def is_behind(self, site):
+        latency_budget = site.get("latency_budget")
+        cost_budget = site.get("cost_budget")
+        if latency_budget is not None and time.monotonic() - self.round_started > latency_budget:
+            return True
+        if cost_budget is not None and self.round_cost > cost_budget:
+            return True
+        return False
+
+    def select_tier(self, site):
+        tier = site.get("default", 0)
+        if self.is_behind(site):
+            tier = max(0, tier - 1)
+        return tier
+
+    def estimate_cost(self, model, usage):
+        prices = self.config.get("models", {}).get(model)
+        if not prices or usage is None:
+            return 0.0
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        return (prompt_tokens * prices.get("input_cost_per_1k", 0.0)
+                + completion_tokens * prices.get("output_cost_per_1k", 0.0)) / 1000.0
+
+    async def parse(self, call_site, messages, response_format, agent_type=None, validate=None, agent_alias=None):
+        """
+        Sends a structured-output request using the model chosen for this call site.
+        If `validate` raises ValueError, escalates to the next tier and retries;
+        the last error is re-raised once the strongest tier has also failed.
+        `agent_alias` names the agent making the call and is passed on to the gateway.
+        """
+        site = self.site_config(call_site, agent_type)
+        tiers = site["tiers"]
+        tier = self.select_tier(site)
+        default_tier = site.get("default", 0)
+
+        while True:
+            model = tiers[tier]
+            started = time.monotonic()
+            if self.gateway is not None:
+                response = await self.gateway.parse(
+                    self.world_id,
+                    model=model,
+                    messages=messages,
+                    response_format=response_format,
+                    agent_alias=agent_alias
+                )
+            else:
+                response = await self.client.beta.chat.completions.parse(
+                    model=model,
+                    messages=messages,
+                    response_format=response_format
+                )
+            latency = time.monotonic() - started
+            cost = self.estimate_cost(model, getattr(response, "usage", None))
+            self.round_cost += cost
+            parsed = response.choices[0].message.parsed
+
+            record = {
+                "call_site": call_site,
+                "agent_type": agent_type,
+                "agent_alias": agent_alias,
+                "model": model,
+                "tier": tier,
+                "fallback": tier < default_tier,
+                "escalated": tier > default_tier,
+                "latency": latency,
+                "cost": cost,
+                "valid": True,
+            }
+            try:
+                if validate:
+                    validate(parsed)
+            except ValueError:
+                record["valid"] = False
+                self.records.append(record)
+                if self.gateway is not None:
+                    # Never serve a response that failed validation from the shared cache
+                    self.gateway.forget(model, messages, response_format)
+                if tier + 1 >= len(tiers):
+                    raise
+                tier += 1
+                continue
+
+            self.records.append(record)
+            return parsed
+
+    def usage_summary(self):
+        """Returns per-model call counts, failures, total latency and cost."""
+        summary = {}
+        for record in self.records:
+            entry = summary.setdefault(record["model"], {"calls": 0, "invalid": 0, "latency": 0.0, "cost": 0.0})
+            entry["calls"] += 1
+            entry["invalid"] += 0 if record["valid"] else 1
+            entry["latency"] += record["latency"]
+            entry["cost"] += record["cost"]
+        return summary
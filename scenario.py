@@ -0,0 +1,95 @@
+import json
+from os import path
+
+BUNDLE_VERSION = 2
+DEFAULT_SCENARIO = path.join(path.dirname(path.abspath(__file__)), "config")
+
+AGENT_FIELDS = ["alias", "name", "type", "identity", "available_actions", "military_power", "economic_power", "goal", "description"]
+
+def read_json(config_dir, file_name):
+    with open(path.join(config_dir, file_name)) as f:
+        return json.load(f)
+
+def read_relations(config_dir, file_name):
+    relations_data = read_json(config_dir, file_name)["relations"]
+    return {alias: data["relations"] for alias, data in relations_data.items()}
+
+def validate_relations(relations, aliases, label):
+    if set(relations) != set(aliases):
+        raise ValueError(f"{label} relations must list exactly the agents {sorted(aliases)}, got {sorted(relations)}.")
+    for agent, row in relations.items():
+        if set(row) != set(aliases):
+            raise ValueError(f"{label} relations of '{agent}' must cover every agent.")
+        for other, val in row.items():
+            if val not in (-1, 0, 1):
+                raise ValueError(f"{label} relation {agent}->{other} must be -1, 0 or 1, got {val}.")
+            if relations[other][agent] != val:
+                raise ValueError(f"{label} relations are not symmetric for {agent} and {other}.")
+
+def validate_models(models):
+    call_sites = models.get("call_sites", {})
+    for call_site in ["agent.act", "agent.messages", "world.decide"]:
+        if call_site not in call_sites:
+            raise ValueError(f"Model config is missing call site '{call_site}'.")
+    for call_site, site in call_sites.items():
+        tiers = site.get("tiers")
+        if not tiers:
+            raise ValueError(f"Call site '{call_site}' must list at least one model tier.")
+        if not 0 <= site.get("default", 0) < len(tiers):
+            raise ValueError(f"Default tier of call site '{call_site}' is out of range.")
+    for agent_type, overrides in models.get("agent_types", {}).items():
+        for call_site, site in overrides.items():
+            if call_site not in call_sites:
+                raise ValueError(f"Agent type '{agent_type}' overrides unknown call site '{call_site}'.")
+            tiers = site.get("tiers", call_sites[call_site]["tiers"])
+            if not 0 <= site.get("default", 0) < len(tiers):
+                raise ValueError(f"Default tier for '{agent_type}' at '{call_site}' is out of range.")
+
+def validate_scenario(bundle):
+    aliases = []
+    for agent in bundle["agents"]:
+        missing = [field for field in AGENT_FIELDS if field not in agent]
+        if missing:
+            raise ValueError(f"Agent {agent.get('alias', '?')} is missing fields: {', '.join(missing)}.")
+        aliases.append(agent["alias"])
+    if len(set(aliases)) != len(aliases):
+        raise ValueError("Agent aliases must be unique.")
+    validate_relations(bundle["relations_start"], aliases, "Start")
+    validate_relations(bundle["relations_end"], aliases, "End")
+    validate_models(bundle["models"])
+
+def compile_scenario(config_dir=DEFAULT_SCENARIO):
+    """
+    Reads a scenario directory (agents, simulation settings, start/end relations,
+    action effects, messages and model routing) into one validated bundle dict.
+    """
+    bundle = {
+        "version": BUNDLE_VERSION,
+        "agents": read_json(config_dir, "agents.json"),
+        "simulation": read_json(config_dir, "simulation.json"),
+        "relations_start": read_relations(config_dir, "relations_start.json"),
+        "relations_end": read_relations(config_dir, "relations_end.json"),
+        "action_effects": read_json(config_dir, "action_effects.json"),
+        "messages": read_json(config_dir, "messages.json"),
+        "models": read_json(config_dir, "models.json"),
+    }
+    validate_scenario(bundle)
+    return bundle
+
+def save_bundle(bundle, bundle_path):
+    with open(bundle_path, "w") as f:
+        json.dump(bundle, f, separators=(",", ":"))
+
+def load_bundle(bundle_path):
+    """Loads a bundle written by save_bundle in a single read. Bundles are validated when compiled."""
+    with open(bundle_path) as f:
+        bundle = json.load(f)
+    if bundle.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported scenario bundle version {bundle.get('version')}; recompile it.")
+    return bundle
+
+def load_scenario(scenario_path=DEFAULT_SCENARIO):
+    """Loads a scenario from either a config directory or a compiled bundle file."""
+    if path.isdir(scenario_path):
+        return compile_scenario(scenario_path)
+    return load_bundle(scenario_path)
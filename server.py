@@ -0,0 +1,307 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import time
+import types
+from collections import OrderedDict, deque
+from router import ModelRouter
+from main import create_client, create_simulation, simulation_loop
+from scenario import load_scenario
+import custom_logger as logger_module
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+class ResponseCache:
+    """LRU cache of structured-output responses keyed by model, prompt and response format."""
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, messages, response_format):
+        payload = json.dumps([model, messages, response_format.__name__], sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        response = self.entries.get(key)
+        if response is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return response
+
+    def put(self, key, response):
+        if self.max_size <= 0:
+            return
+        self.entries[key] = response
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+class FairRateLimiter:
+    """
+    Global limit on requests per second and requests in flight, shared by all worlds.
+    Waiting requests are granted round-robin across worlds, so one world with many
+    agents cannot starve the others.
+    """
+    def __init__(self, requests_per_second=None, max_concurrency=32):
+        self.rate = requests_per_second
+        self.burst = max(1.0, requests_per_second or 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.waiters = {}  # world_id -> deque of futures
+        self.order = deque()  # world_ids with waiters, in round-robin order
+        self.timer = None
+
+    def refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def has_token(self):
+        return not self.rate or self.tokens >= 1
+
+    def dispatch(self):
+        self.refill()
+        while self.order and self.in_flight < self.max_concurrency and self.has_token():
+            world_id = self.order.popleft()
+            waiters = self.waiters[world_id]
+            future = waiters.popleft()
+            if waiters:
+                self.order.append(world_id)
+            else:
+                del self.waiters[world_id]
+            if future.cancelled():
+                continue
+            self.in_flight += 1
+            if self.rate:
+                self.tokens -= 1
+            future.set_result(None)
+
+        if self.order and self.in_flight < self.max_concurrency and not self.has_token() and self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later((1 - self.tokens) / self.rate, self.on_timer)
+
+    def on_timer(self):
+        self.timer = None
+        self.dispatch()
+
+    async def acquire(self, world_id):
+        future = asyncio.get_running_loop().create_future()
+        if world_id not in self.waiters:
+            self.waiters[world_id] = deque()
+            self.order.append(world_id)
+        self.waiters[world_id].append(future)
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the cancellation arrived
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self.dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, world_id):
+        await self.acquire(world_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+class Gateway:
+    """
+    The single client, response cache and rate limiter that every hosted world calls through.
+
+    With caching enabled, identical requests in flight at the same time are coalesced
+    into one API call, and later identical requests are answered from the cache.
+    """
+    def __init__(self, client, cache, limiter):
+        self.client = client
+        self.cache = cache
+        self.limiter = limiter
+        self.calls = {}  # world_id -> requests sent to the API
+        self.pending = {}  # cache key -> future of the in-flight response
+
+    async def request(self, world_id, model, messages, response_format):
+        async with self.limiter.slot(world_id):
+            response = await self.client.beta.chat.completions.parse(
+                model=model,
+                messages=messages,
+                response_format=response_format
+            )
+        self.calls[world_id] = self.calls.get(world_id, 0) + 1
+        return response
+
+    async def parse(self, world_id, model, messages, response_format, agent_alias=None):
+        if self.cache.max_size <= 0:
+            return await self.request(world_id, model, messages, response_format)
+
+        key = self.cache.key(model, messages, response_format)
+        while True:
+            cached = self.cache.get(key)
+            if cached is not None:
+                # Served from cache: nothing was billed for this call
+                return types.SimpleNamespace(choices=cached.choices, usage=None)
+            if key not in self.pending:
+                break
+            # Shielded so a cancelled waiter does not cancel the shared request
+            cached = await asyncio.shield(self.pending[key])
+            if cached is not None:
+                return types.SimpleNamespace(choices=cached.choices, usage=None)
+            # The leading request failed; check the cache and pending requests again
+            # so only one waiter claims the key and the others wait on its retry
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[key] = future
+        response = None
+        try:
+            response = await self.request(world_id, model, messages, response_format)
+            self.cache.put(key, response)
+            return response
+        finally:
+            # Resolve before unregistering so no waiter is left on an orphaned future
+            future.set_result(response)
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+    def forget(self, model, messages, response_format):
+        """Drops a cached response, e.g. after it failed validation."""
+        self.cache.discard(self.cache.key(model, messages, response_format))
+
+class WorldServer:
+    """
+    Hosts many simulations on one event loop. All worlds share one OpenAI client
+    (and so one HTTP connection pool) and one fair rate limiter.
+
+    The response cache is off by default (`cache_size=0`). When enabled it is shared
+    across worlds and keyed only by model and prompt, so a world that repeats another
+    world's prompt replays its completion: cached worlds are not independent samples.
+
+    Use it in-process via `start_world`/`status`/`wait`, or over a local socket via
+    `serve`, which accepts one JSON command per line:
+    {"cmd": "start", "world_id": "a", "rounds": 5}, {"cmd": "status"}, {"cmd": "wait", "world_id": "a"}
+    """
+    def __init__(self, client, requests_per_second=None, max_concurrency=32, cache_size=0, output_dir="output", scenario=None, render=False):
+        self.client = client
+        self.scenario = scenario  # Shared scenario bundle; None compiles the default config per world
+        self.gateway = Gateway(client, ResponseCache(cache_size), FairRateLimiter(requests_per_second, max_concurrency))
+        self.output_dir = output_dir
+        self.render = render  # Matrix plots are off by default to keep hosted worlds light
+        self.worlds = {}
+
+    def start_world(self, world_id, rounds=5):
+        if world_id in self.worlds and not self.worlds[world_id]["task"].done():
+            raise ValueError(f"World '{world_id}' is already running.")
+
+        scenario = self.scenario or load_scenario()
+        router = ModelRouter(self.client, gateway=self.gateway, world_id=world_id, config=scenario["models"])
+        simulation = create_simulation(
+            self.client, router=router, output_dir=os.path.join(self.output_dir, world_id) if self.render else None,
+            scenario=scenario
+        )
+        progress = {"rounds": rounds, "rounds_done": 0, "started": time.monotonic(), "finished": None, "error": None}
+
+        def on_round_end(step):
+            progress["rounds_done"] = step + 1
+
+        async def run():
+            try:
+                await simulation_loop(rounds=rounds, on_round_end=on_round_end, world_id=world_id, **simulation)
+            except Exception as e:
+                progress["error"] = repr(e)
+                raise
+            finally:
+                progress["finished"] = time.monotonic()
+
+        entry = {"simulation": simulation, "router": router, "progress": progress}
+        entry["task"] = asyncio.get_running_loop().create_task(run())
+        self.worlds[world_id] = entry
+        return entry["task"]
+
+    def world_status(self, world_id):
+        entry = self.worlds[world_id]
+        progress = entry["progress"]
+        elapsed = (progress["finished"] or time.monotonic()) - progress["started"]
+        served = len(entry["router"].records)
+        if progress["error"]:
+            state = "failed"
+        elif progress["finished"]:
+            state = "done"
+        else:
+            state = "running"
+        return {
+            "state": state,
+            "rounds_done": progress["rounds_done"],
+            "rounds": progress["rounds"],
+            "elapsed": elapsed,
+            "rounds_per_second": progress["rounds_done"] / elapsed if elapsed else 0.0,
+            "calls": served,
+            "calls_per_second": served / elapsed if elapsed else 0.0,
+            "api_calls": self.gateway.calls.get(world_id, 0),
+            "error": progress["error"],
+        }
+
+    def status(self):
+        cache = self.gateway.cache
+        limiter = self.gateway.limiter
+        return {
+            "worlds": {world_id: self.world_status(world_id) for world_id in self.worlds},
+            "cache": {"size": len(cache.entries), "hits": cache.hits, "misses": cache.misses},
+            "in_flight": limiter.in_flight,
+            "waiting": sum(len(waiters) for waiters in limiter.waiters.values()),
+        }
+
+    async def wait(self, world_id=None):
+        tasks = [self.worlds[world_id]["task"]] if world_id else [entry["task"] for entry in self.worlds.values()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return {world_id: self.world_status(world_id) for world_id in self.worlds} if world_id is None else self.world_status(world_id)
+
+    async def handle_command(self, command):
+        cmd = command.get("cmd")
+        if cmd == "start":
+            self.start_world(command["world_id"], command.get("rounds", 5))
+            return self.world_status(command["world_id"])
+        if cmd == "status":
+            return self.status()
+        if cmd == "wait":
+            return await self.wait(command.get("world_id"))
+        raise ValueError(f"Unknown command '{cmd}'.")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = {"ok": True, "result": await self.handle_command(json.loads(line))}
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e)}
+                writer.write((json.dumps(reply, default=str) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+if __name__ == "__main__":
+    client = create_client()
+    logger_module.setup_logger(log_level=logging.INFO, log_file='simulation.log', events_file='events.jsonl')
+    asyncio.run(WorldServer(client).serve())
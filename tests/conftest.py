@@ -0,0 +1,5 @@
+import sys
+from os import path
+
+# The simulation modules live at the repository root rather than in a package
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
@@ -0,0 +1,14 @@
+from agent import Agent
+from relations_matrix import RelationsMatrix
+
+def test_retrieval_query_leaves_out_own_alias():
+    aliases = ["A", "B", "C"]
+    known_entities = {alias: {"name": alias, "identity": "An agent"} for alias in aliases}
+    relations_matrix = RelationsMatrix(relations={
+        "A": {"A": 1, "B": 1, "C": -1},
+        "B": {"A": 1, "B": 1, "C": 0},
+        "C": {"A": -1, "B": 0, "C": 1},
+    })
+    agent = Agent("A", "Agent A", "Nation", "An agent", ["patrol"], 1, 1, "Hold territory", "", None,
+                  False, known_entities, router=object(), messages_config={})
+    assert agent.retrieval_query(relations_matrix) == "A Hold territory allies: B enemies: C"
@@ -0,0 +1,35 @@
+from coalition_structure import CoalitionStructure
+from relations_matrix import RelationsMatrix
+
+ALIASES = ["A", "B", "C", "D", "E", "F"]
+
+def structure_from(relation):
+    relations = {a: {b: relation(i, j) for j, b in enumerate(ALIASES)} for i, a in enumerate(ALIASES)}
+    return CoalitionStructure(ALIASES, relations)
+
+def test_polarization_two_hostile_camps_is_one():
+    structure = structure_from(lambda i, j: 1 if (i < 3) == (j < 3) else -1)
+    assert structure.polarization() == 1.0
+
+def test_polarization_grand_alliance_is_zero():
+    structure = structure_from(lambda i, j: 1)
+    assert structure.polarization() == 0.0
+
+def test_polarization_all_against_all_is_zero():
+    structure = structure_from(lambda i, j: 1 if i == j else -1)
+    assert structure.polarization() == 0.0
+
+def test_polarization_without_triangles_uses_cut_share():
+    aliases = ["A", "B", "C"]
+    relations = {a: {b: 1 if a == b else 0 for b in aliases} for a in aliases}
+    relations["A"]["B"] = relations["B"]["A"] = -1
+    assert CoalitionStructure(aliases, relations).polarization() == 0.5
+
+def test_polarization_tracks_updates_incrementally():
+    relations_matrix = RelationsMatrix(relations={a: {b: 1 if a == b else 0 for b in ALIASES} for a in ALIASES})
+    structure = CoalitionStructure(ALIASES, relations_matrix.relations)
+    relations_matrix.add_listener(structure.on_update)
+    for i in range(6):
+        for j in range(i + 1, 6):
+            relations_matrix.update_relations(ALIASES[i], ALIASES[j], 1 if (i < 3) == (j < 3) else -1)
+    assert structure.polarization() == 1.0
@@ -0,0 +1,17 @@
+import json
+import logging
+import numpy as np
+from custom_logger import JsonLinesFormatter
+
+def make_event_record(event, payload):
+    record = logging.LogRecord("events", logging.INFO, __file__, 0, event, None, None)
+    record.event = event
+    record.payload = payload
+    return record
+
+def test_json_lines_formatter_writes_non_finite_values_as_null():
+    record = make_event_record("analytics", {"step": 0, "MSE": np.float64("nan"), "nested": [float("inf"), 1.5]})
+    event = json.loads(JsonLinesFormatter().format(record))
+    assert event["MSE"] is None
+    assert event["nested"] == [None, 1.5]
+    assert event["step"] == 0
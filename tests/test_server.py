@@ -0,0 +1,52 @@
+import asyncio
+import types
+from action import Action
+from server import Gateway, ResponseCache, FairRateLimiter
+
+MESSAGES = [{"role": "user", "content": "Choose an action."}]
+
+class FlakyCompletions:
+    """Stub for client.beta.chat.completions whose first `failures` calls raise."""
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def parse(self, model, messages, response_format):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        if self.calls <= self.failures:
+            raise RuntimeError("boom")
+        parsed = Action(subject="A", object="B", action="patrol")
+        message = types.SimpleNamespace(parsed=parsed)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+
+def make_gateway(failures):
+    completions = FlakyCompletions(failures)
+    client = types.SimpleNamespace(beta=types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions)))
+    return Gateway(client, ResponseCache(16), FairRateLimiter()), completions
+
+def test_identical_requests_in_flight_share_one_call():
+    gateway, completions = make_gateway(failures=0)
+
+    async def run():
+        return await asyncio.gather(*[gateway.parse(world, "m", MESSAGES, Action) for world in "abc"])
+
+    responses = asyncio.run(run())
+    assert completions.calls == 1
+    assert all(response.choices[0].message.parsed.action == "patrol" for response in responses)
+    assert gateway.pending == {}
+
+def test_failed_leading_request_is_retried_once_for_all_waiters():
+    gateway, completions = make_gateway(failures=1)
+
+    async def run():
+        return await asyncio.wait_for(
+            asyncio.gather(*[gateway.parse(world, "m", MESSAGES, Action) for world in "abc"], return_exceptions=True),
+            timeout=5
+        )
+
+    results = asyncio.run(run())
+    assert isinstance(results[0], RuntimeError)
+    assert all(result.choices[0].message.parsed.action == "patrol" for result in results[1:])
+    assert completions.calls == 2
+    assert gateway.pending == {}
@@ -3,16 +3,20 @@ import json
 from os import path
 from update import UpdateItem, UpdateList
 from action import Action  
+from router import ModelRouter
+from history import WorldHistory
 
 class World:
-    def __init__(self, agents, relations_matrix, mail, logger, client):
+    def __init__(self, agents, relations_matrix, mail, logger, client, router=None, history_depth=100, decision_history=3, action_effects=None):
         self.agents = {agent.alias: agent for agent in agents}
         self.relations_matrix = relations_matrix
         self.mail = mail
-        self.states = []
-        self.actions_effects = self.load_action_effects()
+        self.history = WorldHistory(history_depth)
+        self.decision_history = decision_history  # Number of past states shown to the adjudicator
+        self.actions_effects = action_effects if action_effects is not None else self.load_action_effects()
         self.logger = logger
         self.client = client
+        self.router = router or ModelRouter(client)
 
     def load_action_effects(self):
         script_dir = path.dirname(path.abspath(__file__))
@@ -29,15 +33,18 @@ class World:
         }
         return state
 
+    def get_states(self, last=None):
+        """
+        Returns recorded states oldest first. Each call rebuilds and deep-copies
+        them from the history buffer, so pass `last` when only recent ones are needed.
+        """
+        return self.history.states(last=last)
+
     def add_action(self, agent_alias, action):
-        current_state = self.states[-1] if self.states else self.get_current_state()
-        current_state["actions"][agent_alias].append(action.model_dump())
+        self.history.add_action(agent_alias, action.model_dump())
 
     def record_state(self):
-        state = self.get_current_state()
-        self.states.append(state)
-        if len(self.states) > 3:  # Keep only the latest 3 states
-            self.states.pop(0)
+        self.history.record(self.get_current_state())
 
     
     def calculate_action_outcomes(self, latest_actions):
@@ -85,7 +92,8 @@ class World:
         serializable_actions = [action.model_dump() if isinstance(action, Action) else action for action in latest_actions]
 
         context = {
-            "states": self.states,
+            "states": self.get_states(last=self.decision_history),
+            "current_state": self.get_current_state(),
             "latest_actions": serializable_actions,
             "action_effects": self.actions_effects
         }
@@ -117,18 +125,14 @@ class World:
         }}
         """
 
-        response = await self.client.beta.chat.completions.parse(
-            model="gpt-4o-2024-08-06",
+        updates_parsed = await self.router.parse(
+            "world.decide",
             messages=[
                 {"role": "system", "content": decision_prompt}
             ],
             response_format=UpdateList
         )
 
-        # print(f"API Response: {response.choices[0].message.parsed}")
-
-        updates_parsed = response.choices[0].message.parsed
-
         return self.parse_updates(updates_parsed)
 
 